@@ -0,0 +1,95 @@
+"""
+Cache Helper Functions
+
+Redis-backed response cache used by read-heavy endpoints.
+If REDIS_URL is not set, every lookup is a miss and writes are skipped.
+Redis errors are logged and counted, never raised, so a slow or down Redis
+only costs a cache miss.
+
+Invalidation is generation-based: cache keys embed a per-namespace counter and
+invalidating a namespace bumps it. A value computed before an invalidation is
+therefore written under the old generation and never read again, which closes
+the race a SCAN+DEL would leave with a concurrent write. Old keys expire by TTL.
+"""
+
+import logging
+import os
+from typing import Any, Optional
+
+import orjson
+from dotenv import load_dotenv
+from redis import asyncio as aioredis
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+redis = None
+
+redis_url = os.getenv("REDIS_URL")
+
+if redis_url:
+    redis = aioredis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+cache_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+def _record_error(action: str, e: Exception):
+    cache_stats["errors"] += 1
+    logger.warning("Redis %s failed: %s", action, e)
+
+async def get_generation(namespace: str) -> int:
+    """Return the current invalidation generation for namespace"""
+    if redis is None:
+        return 0
+    try:
+        gen = await redis.get(f"{namespace}:gen")
+    except Exception as e:
+        _record_error("get generation", e)
+        return 0
+    return int(gen or 0)
+
+async def get_cached(key: str) -> Optional[Any]:
+    """Return the decoded cached value for key, or None"""
+    if redis is None:
+        return None
+    try:
+        cached = await redis.get(key)
+        value = None if cached is None else orjson.loads(cached)
+    except Exception as e:
+        _record_error("get", e)
+        value = None
+
+    if value is None:
+        cache_stats["misses"] += 1
+        return None
+    cache_stats["hits"] += 1
+    return value
+
+async def set_cached(key: str, value: Any, ttl: int = 300):
+    """Store value as JSON under key with a TTL in seconds"""
+    if redis is None:
+        return
+    try:
+        await redis.set(key, orjson.dumps(value), ex=ttl)
+    except Exception as e:
+        _record_error("set", e)
+
+async def invalidate(namespace: str):
+    """Invalidate every cached key in namespace by bumping its generation"""
+    if redis is None:
+        return
+    try:
+        await redis.incr(f"{namespace}:gen")
+    except Exception as e:
+        _record_error("invalidate", e)
+
+async def close_cache():
+    """Close the shared Redis client"""
+    global redis
+    if redis is not None:
+        try:
+            await redis.aclose()
+        except Exception as e:
+            _record_error("close", e)
+    redis = None
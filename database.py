@@ -5,8 +5,10 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
+import logging
 import os
 from dotenv import load_dotenv
 from typing import Union
@@ -15,18 +17,65 @@ from pydantic import BaseModel
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 _client = None
 db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+INDEX_BUILD_TIMEOUT_S = 600
+
+def connect_db():
+    """Create the shared Motor client once per process and return the database"""
+    global _client, db
+    if _client is None and database_url and database_name:
+        _client = AsyncIOMotorClient(
+            database_url,
+            maxPoolSize=200,
+            minPoolSize=20,
+            compressors="zstd,zlib",
+            serverSelectionTimeoutMS=2000,
+            socketTimeoutMS=5000,
+        )
+        db = _client[database_name]
+    return db
+
+def close_db():
+    """Close the shared Motor client"""
+    global _client, db
+    if _client is not None:
+        _client.close()
+    _client = None
+    db = None
+
+async def ensure_indexes():
+    """Create indexes backing the feed and digest queries.
+    Equality fields come first and published_at last so the newest-first sort is
+    served by the index, not sorted in memory.
+    Failures are logged, never raised, so an unreachable database can't block startup.
+    """
+    if db is None:
+        return
+
+    try:
+        # Index builds on a large collection can outlast the client's socketTimeoutMS
+        with pymongo.timeout(INDEX_BUILD_TIMEOUT_S):
+            # Digest: {language} sorted by published_at
+            await db["newsitem"].create_index([("language", 1), ("published_at", -1)])
+            # Feed without city/interests filters: {language, urgency}
+            await db["newsitem"].create_index([("language", 1), ("urgency", 1), ("published_at", -1)])
+            # Feed filtered on every field
+            await db["newsitem"].create_index(
+                [("language", 1), ("urgency", 1), ("city", 1), ("interests", 1), ("published_at", -1)]
+            )
+            await db["newsitem"].create_index([("interests", 1), ("published_at", -1)])
+    except Exception as e:
+        logger.warning("Could not create newsitem indexes: %s", e)
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +89,46 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def create_documents(collection_name: str, items: list):
+    """Insert many documents in one round trip with timestamps.
+    Takes ownership of dict items: they are stamped and given an _id in place, not copied.
+    """
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = datetime.now(timezone.utc)
+    docs = []
+    for data in items:
+        # Convert Pydantic model to dict if needed
+        data_dict = data.model_dump() if isinstance(data, BaseModel) else data
+        data_dict['created_at'] = now
+        data_dict['updated_at'] = now
+        docs.append(data_dict)
+
+    if not docs:
+        return []
+
+    result = await db[collection_name].insert_many(docs, ordered=False)
+    return [str(_id) for _id in result.inserted_ids]
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally returning only projected fields"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
+
+async def aggregate_documents(collection_name: str, pipeline: list, limit: int = None):
+    """Run an aggregation pipeline on collection"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = db[collection_name].aggregate(pipeline)
+    return await cursor.to_list(length=limit)
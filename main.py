@@ -1,16 +1,45 @@
+import asyncio
+import hashlib
 import os
+import re
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional, Literal
 
-from fastapi import FastAPI, HTTPException, Query
+import ahocorasick
+import msgspec
+import orjson
+from bson import ObjectId
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from brotli_asgi import BrotliMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from database import db, create_document, get_documents
+from database import connect_db, close_db, ensure_indexes, create_documents, aggregate_documents
+from pipelines import build_feed_pipeline, build_digest_pipeline
+from cache import cache_stats, close_cache, get_generation, get_cached, set_cached, invalidate
 
-# External libraries for HTTP and TTS (placeholders using built-ins/requests)
-import requests
+# External libraries for HTTP and TTS (shared async HTTP client for source fetching)
+import httpx
 
-app = FastAPI(title="PakGPT News Engine")
+def _orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+class NewsJSONResponse(ORJSONResponse):
+    """orjson-encoded response that also handles Mongo ObjectIds and naive UTC datetimes.
+    FastAPI runs jsonable_encoder on plain return values before render(), so hot
+    routes return an instance directly to skip that pure-Python pass.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NAIVE_UTC)
+
+
+app = FastAPI(title="PakGPT News Engine", default_response_class=NewsJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +49,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON payloads: Brotli when accepted, falling back to gzip otherwise
+app.add_middleware(BrotliMiddleware, quality=5, minimum_size=512, gzip_fallback=True)
+
+@app.on_event("startup")
+async def startup():
+    app.state.db = connect_db()
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=5.0,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
+    )
+    # Index creation runs in the background so startup never waits on the database
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+    await close_cache()
+    close_db()
+    app.state.db = None
+
 # -------------------- Schemas for API payloads --------------------
 class IngestRequest(BaseModel):
     sources: List[str] = Field(default_factory=list, description="List of source identifiers to fetch from")
@@ -31,61 +82,200 @@ class PersonalizeRequest(BaseModel):
     urgency: Literal["breaking", "important", "full"] = "important"
     language: Literal["en", "ur"] = "en"
 
-class AudioRequest(BaseModel):
+class AudioRequest(msgspec.Struct):
     text: str
     language: Literal["en", "ur"] = "en"
 
+
+# Inline JSON schema so /api/audio still documents its request body in OpenAPI
+_AUDIO_REQUEST_SCHEMA = msgspec.json.schema_components([AudioRequest])[1]["AudioRequest"]
+
+
+_MSGSPEC_PATH = re.compile(r" - at `\$(.*)`$")
+_MSGSPEC_PATH_PART = re.compile(r"\.([^.\[]+)|\[(\d+)\]")
+_MSGSPEC_MISSING = re.compile(r"^Object missing required field `(.+)`")
+_MSGSPEC_BYTE = re.compile(r"\(byte (\d+)\)")
+
+
+def _msgspec_validation_error(e: msgspec.ValidationError) -> dict:
+    """Map a msgspec error onto the loc/type FastAPI's Pydantic validation reports.
+    msgspec stops at the first error, so only that one is returned.
+    """
+    msg = str(e)
+    loc = ["body"]
+    path = _MSGSPEC_PATH.search(msg)
+    if path:
+        msg = msg[:path.start()]
+        loc += [name if name else int(index) for name, index in _MSGSPEC_PATH_PART.findall(path.group(1))]
+
+    missing = _MSGSPEC_MISSING.match(msg)
+    if missing:
+        return {"type": "missing", "loc": tuple(loc + [missing.group(1)]), "msg": "Field required", "input": None}
+    if msg.startswith("Expected `str`"):
+        return {"type": "string_type", "loc": tuple(loc), "msg": "Input should be a valid string", "input": None}
+    if msg.startswith("Expected `object`"):
+        return {
+            "type": "model_attributes_type",
+            "loc": tuple(loc),
+            "msg": "Input should be a valid dictionary or object to extract fields from",
+            "input": None,
+        }
+    if msg.startswith("Invalid enum value"):
+        return {"type": "literal_error", "loc": tuple(loc), "msg": msg, "input": None}
+    return {"type": "value_error", "loc": tuple(loc), "msg": msg, "input": None}
+
+
+async def parse_audio(request: Request) -> AudioRequest:
+    """Decode and validate the /api/audio body with msgspec instead of Pydantic.
+    Errors are raised as RequestValidationError with the loc/type Pydantic would use.
+    Like FastAPI, a body without a Content-Type header is parsed as JSON.
+    """
+    body = await request.body()
+    if not body:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+
+    content_type = request.headers.get("content-type")
+    if content_type is not None:
+        media_type = content_type.split(";")[0].strip().lower()
+        if media_type != "application/json" and not media_type.endswith("+json"):
+            raise RequestValidationError([{
+                "type": "model_attributes_type",
+                "loc": ("body",),
+                "msg": "Input should be a valid dictionary or object to extract fields from",
+                "input": body.decode(errors="replace"),
+            }])
+
+    try:
+        return msgspec.json.decode(body, type=AudioRequest)
+    except msgspec.ValidationError as e:
+        raise RequestValidationError([_msgspec_validation_error(e)])
+    except msgspec.DecodeError as e:
+        byte = _MSGSPEC_BYTE.search(str(e))
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", int(byte.group(1))) if byte else ("body",),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": str(e)},
+        }])
+
 # -------------------- Utility AI mock functions --------------------
 # Note: In this environment, we don't call external LLMs. We'll implement
 # deterministic placeholder logic that structures data as required.
 
+_EN_KEY = "Key point: "
+_EN_SRC = "Source: "
+_EN_TIME = "Time: "
+_EN_IMPACT = "Potential impact on citizens and businesses to be monitored."
+_UR_KEY = "اہم نقطہ: "
+_UR_SRC = "سورس: "
+_UR_TIME = "وقت: "
+_UR_IMPACT = "شہریوں اور کاروبار پر ممکنہ اثرات کے لئے نظر رکھیں۔"
+
+
+@lru_cache(maxsize=4096)
+def _summary_inner(title: str, source: str, published_at: str, language: str) -> tuple:
+    """Cached (bullets, impact) for one (title, source, published_at, language) key.
+    Kept as nested tuples so the shared cached value can't be mutated by callers.
+    """
+    if language == "ur":
+        return (f"{_UR_KEY}{title}", f"{_UR_SRC}{source}", f"{_UR_TIME}{published_at}"), _UR_IMPACT
+    return (f"{_EN_KEY}{title}", f"{_EN_SRC}{source}", f"{_EN_TIME}{published_at}"), _EN_IMPACT
+
+
 def ai_clean_and_summarize(article: dict, language: str = "en") -> dict:
     """Return a bias-reduced 3-bullet summary and 1-line impact.
     This is a deterministic placeholder to keep the app functional.
     """
-    title = article.get("title") or "Untitled"
-    content = article.get("description") or article.get("content") or ""
-    bullets = [
-        f"Key point: {title[:70]}",
-        f"Source: {article.get('source', 'unknown')}",
-        f"Time: {article.get('published_at', '')}",
-    ]
-    impact = "Potential impact on citizens and businesses to be monitored."
-
-    if language == "ur":
-        bullets = [
-            "اہم نقطہ: " + title[:70],
-            "سورس: " + (article.get('source') or "نامعلوم"),
-            "وقت: " + (str(article.get('published_at')) or ""),
-        ]
-        impact = "شہریوں اور کاروبار پر ممکنہ اثرات کے لئے نظر رکھیں۔"
-
-    return {
-        "bullets": bullets[:3],
-        "impact": impact,
-    }
+    title = (article.get("title") or "Untitled")[:70]
+    pub = article.get("published_at") or ""
+    src = article.get("source") or ("نامعلوم" if language == "ur" else "unknown")
+    bullets, impact = _summary_inner(title, src, pub, language)
+    return {"bullets": bullets, "impact": impact}
+
+
+# (fact_status, risk_score); kept immutable since they are shared and cached
+_VERIFIED = ("Verified", 5)
+_RUMOUR = ("Rumour", 65)
+_UNCONFIRMED = ("Unconfirmed", 30)
+
+# Single-pass multi-keyword matcher over lowercased titles
+_FACT_KEYWORDS = ahocorasick.Automaton()
+for _word, _label in [
+    ("breaking", "V"), ("official", "V"), ("gov", "V"),
+    ("rumour", "R"), ("leak", "R"), ("unconfirmed", "R"),
+]:
+    _FACT_KEYWORDS.add_word(_word, _label)
+_FACT_KEYWORDS.make_automaton()
+
+
+@lru_cache(maxsize=4096)
+def _fact_check_inner(title: str) -> tuple:
+    """Cached classification for one lowercased title."""
+    rumour = False
+    for _, label in _FACT_KEYWORDS.iter(title):
+        # Verification keywords take precedence over rumour keywords
+        if label == "V":
+            return _VERIFIED
+        rumour = True
+    return _RUMOUR if rumour else _UNCONFIRMED
 
 
 def ai_fact_check(article: dict) -> dict:
     """Mock fact-check classification with simple heuristics.
     In production, replace with proper pipeline and sources.
     """
-    title = (article.get("title") or "").lower()
-    if any(x in title for x in ["breaking", "official", "gov"]):
-        return {"fact_status": "Verified", "risk_score": 5}
-    if any(x in title for x in ["rumour", "leak", "unconfirmed"]):
-        return {"fact_status": "Rumour", "risk_score": 65}
-    return {"fact_status": "Unconfirmed", "risk_score": 30}
+    fact_status, risk_score = _fact_check_inner((article.get("title") or "").lower())
+    return {"fact_status": fact_status, "risk_score": risk_score}
+
+
+# -------------------- Digest fallback --------------------
+_FALLBACK_BULLETS = (
+    "Key developments summarized",
+    "Numbers and context simplified",
+    "What to watch today",
+)
+
+_FALLBACK_IMPACT = "Expect ripple effects for households and businesses."
+
+_FALLBACK_ITEMS_EN = tuple(
+    {
+        "title": t,
+        "bullets": _FALLBACK_BULLETS,
+        "impact": _FALLBACK_IMPACT,
+        "why_it_matters": _FALLBACK_IMPACT,
+        "source": "PakGPT",
+        "fact_status": "Unconfirmed",
+        "risk_score": 20,
+    }
+    for t in (
+        "Fiscal updates and market outlook",
+        "Security and regional developments",
+        "PSX morning momentum",
+        "Monsoon/weather advisory",
+        "Tech/startup funding news",
+    )
+)
 
 
 # -------------------- Routes --------------------
 @app.get("/")
-def root():
+async def root():
     return {"message": "PakGPT News Engine backend running"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """In-process and Redis cache counters."""
+    return {
+        "summary_cache": _summary_inner.cache_info()._asdict(),
+        "fact_check_cache": _fact_check_inner.cache_info()._asdict(),
+        "digest_cache": cache_stats,
+    }
+
+
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -94,6 +284,7 @@ def test_database():
         "connection_status": "Not Connected",
         "collections": []
     }
+    db = getattr(app.state, "db", None)
     try:
         if db is not None:
             response["database"] = "✅ Available"
@@ -101,7 +292,7 @@ def test_database():
             response["database_name"] = getattr(db, 'name', '✅ Connected')
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -117,16 +308,17 @@ def test_database():
 
 
 @app.post("/api/ingest")
-def ingest_news(payload: IngestRequest):
+async def ingest_news(payload: IngestRequest):
     """Ingest news from given sources, clean, summarize, fact-check, and store.
     For demo, we simulate ingestion with a few stubbed articles.
     """
+    now_iso = datetime.utcnow().isoformat()
     sample_articles = [
         {
             "source": "Dawn",
             "title": "Breaking: Govt announces new economic policy",
             "url": "https://www.dawn.com/sample1",
-            "published_at": datetime.utcnow().isoformat(),
+            "published_at": now_iso,
             "city": "Islamabad",
             "interests": ["economy", "politics"],
         },
@@ -134,7 +326,7 @@ def ingest_news(payload: IngestRequest):
             "source": "Geo",
             "title": "PSL updates: Lahore Qalandars clinch close match",
             "url": "https://www.geo.tv/sample2",
-            "published_at": datetime.utcnow().isoformat(),
+            "published_at": now_iso,
             "city": "Lahore",
             "interests": ["sports"],
         },
@@ -142,36 +334,32 @@ def ingest_news(payload: IngestRequest):
             "source": "Express",
             "title": "Technology jobs rising in Karachi's startup ecosystem",
             "url": "https://www.express.pk/sample3",
-            "published_at": datetime.utcnow().isoformat(),
+            "published_at": now_iso,
             "city": "Karachi",
             "interests": ["tech", "jobs"],
         },
     ]
 
-    created_ids = []
+    # AI steps, composed per language in place (sample_articles is rebuilt per call)
     for art in sample_articles:
-        # AI steps
-        summary = ai_clean_and_summarize(art, language=payload.language)
-        check = ai_fact_check(art)
-        # Compose document per language
-        doc = {
-            **art,
-            **summary,
-            **check,
-            "language": payload.language,
-            "urgency": "important",
-        }
-        try:
-            _id = create_document("newsitem", doc)
-            created_ids.append(_id)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
+        art.update(ai_clean_and_summarize(art, language=payload.language))
+        art.update(ai_fact_check(art))
+        art["language"] = payload.language
+        art["urgency"] = "important"
+    try:
+        created_ids = await create_documents("newsitem", sample_articles)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
+    finally:
+        # New items change the digest, so drop any cached copies. This also runs
+        # on errors, since an unordered insert_many can partially succeed.
+        await invalidate("digest")
 
     return {"inserted": len(created_ids), "ids": created_ids}
 
 
 @app.post("/api/feed")
-def get_personalized_feed(payload: PersonalizeRequest):
+async def get_personalized_feed(payload: PersonalizeRequest):
     """Return personalized feed per preferences with 3 bullets, impact, and fact status."""
     query = {}
     if payload.city:
@@ -185,95 +373,95 @@ def get_personalized_feed(payload: PersonalizeRequest):
         query["language"] = payload.language
 
     try:
-        docs = get_documents("newsitem", query, limit=50)
-        # Normalize ObjectId and fields
-        normalized = []
-        for d in docs:
-            d["id"] = str(d.get("_id"))
-            d.pop("_id", None)
-            # Ensure bullets exactly 3
-            bullets = d.get("bullets") or []
-            if len(bullets) > 3:
-                bullets = bullets[:3]
-            elif len(bullets) < 3:
-                bullets += [""] * (3 - len(bullets))
-            d["bullets"] = bullets
-            normalized.append(d)
-        return {"count": len(normalized), "items": normalized}
+        pipeline = build_feed_pipeline(query, limit=50)
+        docs = await aggregate_documents("newsitem", pipeline, limit=50)
+        # Return the response directly so FastAPI skips jsonable_encoder
+        return NewsJSONResponse({"count": len(docs), "items": docs})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
 
 
-@app.post("/api/audio")
-def text_to_audio(payload: AudioRequest):
+_AUDIO_DATA_URL = "data:audio/wav;base64,UGFrR1BULWF1ZGlvLXBsYWNlaG9sZGVy"
+_AUDIO_NOTE = "Demo placeholder. Integrate a real TTS provider in production."
+
+
+@app.post(
+    "/api/audio",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _AUDIO_REQUEST_SCHEMA}},
+        },
+    },
+)
+async def text_to_audio(payload: AudioRequest = Depends(parse_audio)):
     """Generate a simple audio placeholder as a URL. In production, integrate TTS.
     """
-    # For demo, we return a data: URL with text content. Real app would return audio file URL.
-    txt = payload.text.replace("\n", " ")
-    lang = payload.language
-    data_url = f"data:audio/wav;base64,{('UGFrR1BULWF1ZGlvLXBsYWNlaG9sZGVy').strip()}"
-    return {"language": lang, "audio_url": data_url, "note": "Demo placeholder. Integrate a real TTS provider in production."}
+    # For demo, we return a fixed data: URL. Real app would return audio file URL.
+    return {"language": payload.language, "audio_url": _AUDIO_DATA_URL, "note": _AUDIO_NOTE}
 
 
 @app.get("/api/digest")
-def morning_digest(
+async def morning_digest(
+    request: Request,
     language: Literal["en", "ur"] = Query("en"),
     limit: int = Query(10, ge=1, le=20),
 ):
     """Return God Mode morning digest: top headlines + 60-second summary + why it matters."""
+    cache_key = f"digest:{await get_generation('digest')}:{language}:{limit}"
+    cached = await get_cached(cache_key)
+    if cached is not None:
+        etag, body = cached["etag"], cached["body"]
+    else:
+        etag, body, fell_back = await _build_digest(language, limit)
+        # Never cache the fallback, or it would outlive a DB outage by the whole TTL
+        if not fell_back:
+            await set_cached(cache_key, {"etag": etag, "body": body}, ttl=300)
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # Return the response directly so FastAPI skips jsonable_encoder
+    return NewsJSONResponse(body, headers={"ETag": etag})
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of etag against an If-None-Match list, including '*'."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+
+async def _build_digest(language: str, limit: int):
+    """Build the digest body and its ETag, derived from the newest item's timestamp.
+    Also reports whether the simulated fallback items were used.
+    """
     try:
-        docs = get_documents("newsitem", {"language": language}, limit=limit)
+        result = await aggregate_documents("newsitem", build_digest_pipeline(language, limit), limit=1)
+        facets = result[0] if result else {}
     except Exception:
-        docs = []
-
-    # Fallback simulated items if DB empty
-    if not docs:
-        fallback_titles = [
-            "Fiscal updates and market outlook",
-            "Security and regional developments",
-            "PSX morning momentum",
-            "Monsoon/weather advisory",
-            "Tech/startup funding news",
-        ]
-        docs = [
-            {
-                "title": t,
-                "source": "PakGPT",
-                "published_at": datetime.utcnow().isoformat(),
-                "bullets": [
-                    "Key developments summarized",
-                    "Numbers and context simplified",
-                    "What to watch today",
-                ],
-                "impact": "Expect ripple effects for households and businesses.",
-                "fact_status": "Unconfirmed",
-                "risk_score": 20,
-            }
-            for t in fallback_titles
-        ]
-
-    headlines = [d.get("title") for d in docs][:10]
+        facets = {}
+    headlines = [h.get("title") for h in facets.get("headlines", [])]
+    items = facets.get("items", [])
+
+    # Fallback simulated items if DB empty; only the timestamp varies per request,
+    # so the ETag is keyed on a fixed marker to stay stable across requests
+    version = items[0].get("published_at") if items else "fallback"
+    if not items:
+        now = datetime.utcnow().isoformat()
+        items = [{**d, "published_at": now} for d in _FALLBACK_ITEMS_EN]
+        headlines = [d["title"] for d in items]
+
     sixty_sec_summary = (
         " ".join(h[:60] for h in headlines) + (
             "" if language == "en" else " آج کے اہم نکات کا خلاصہ۔"
         )
     )
 
-    items = [
-        {
-            "title": d.get("title"),
-            "bullets": (d.get("bullets") or [])[:3],
-            "impact": d.get("impact"),
-            "why_it_matters": d.get("impact"),
-            "source": d.get("source"),
-            "published_at": d.get("published_at"),
-            "fact_status": d.get("fact_status", "Unconfirmed"),
-            "risk_score": d.get("risk_score", 0),
-        }
-        for d in docs[:10]
-    ]
-
-    return {
+    body = {
         "headlines": headlines,
         "summary_60s": sixty_sec_summary,
         "items": items,
@@ -285,6 +473,10 @@ def morning_digest(
             "US/China moves impacting trade",
         ],
     }
+    # Items are sorted newest first, so version is max(published_at) for real items.
+    # Weak, since the compression middleware sends this body as br, gzip or identity.
+    etag = 'W/"' + hashlib.blake2b(f"{language}:{limit}:{version}".encode(), digest_size=8).hexdigest() + '"'
+    return etag, body, version == "fallback"
 
 
 if __name__ == "__main__":
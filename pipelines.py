@@ -0,0 +1,66 @@
+"""
+Aggregation Pipelines
+
+MongoDB aggregation pipelines and projections used by the API endpoints.
+Kept free of I/O so the stage ordering can be checked without a database.
+"""
+
+# Only fetch the fields each endpoint actually returns.
+FEED_PROJECTION = {
+    "title": 1,
+    "bullets": 1,
+    "impact": 1,
+    "source": 1,
+    "published_at": 1,
+    "fact_status": 1,
+    "risk_score": 1,
+    "city": 1,
+    "interests": 1,
+    "language": 1,
+    "urgency": 1,
+}
+
+DIGEST_ITEM_PROJECTION = {
+    "_id": 0,
+    "title": {"$ifNull": ["$title", None]},
+    "bullets": {"$slice": [{"$ifNull": ["$bullets", []]}, 3]},
+    "impact": {"$ifNull": ["$impact", None]},
+    "why_it_matters": {"$ifNull": ["$impact", None]},
+    "source": {"$ifNull": ["$source", None]},
+    "published_at": {"$ifNull": ["$published_at", None]},
+    "fact_status": {"$ifNull": ["$fact_status", "Unconfirmed"]},
+    "risk_score": {"$ifNull": ["$risk_score", 0]},
+}
+
+
+def build_feed_pipeline(query: dict, limit: int = 50) -> list:
+    """Aggregation pipeline for the personalized feed.
+    $match/$sort/$limit always come first so the newsitem indexes apply and
+    only the surviving documents are reshaped.
+    """
+    return [
+        {"$match": query},
+        {"$sort": {"published_at": -1}},
+        {"$limit": limit},
+        {"$project": {**FEED_PROJECTION, "_id": 0, "id": {"$toString": "$_id"}}},
+        # Pad/truncate bullets to exactly 3
+        {"$addFields": {
+            "bullets": {"$slice": [{"$concatArrays": [{"$ifNull": ["$bullets", []]}, ["", "", ""]]}, 3]},
+        }},
+    ]
+
+
+def build_digest_pipeline(language: str, limit: int = 10) -> list:
+    """Aggregation pipeline for the morning digest.
+    The shared $match/$sort/$limit prefix runs once above the $facet, which
+    returns headlines and items from the same scan in one round trip.
+    """
+    return [
+        {"$match": {"language": language}},
+        {"$sort": {"published_at": -1}},
+        {"$limit": min(limit, 10)},
+        {"$facet": {
+            "headlines": [{"$project": {"_id": 0, "title": 1}}],
+            "items": [{"$project": DIGEST_ITEM_PROJECTION}],
+        }},
+    ]
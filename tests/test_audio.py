@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def _error(response):
+    assert response.status_code == 422
+    (error,) = response.json()["detail"]
+    return error
+
+
+def test_audio_accepts_json_body():
+    response = client.post("/api/audio", json={"text": "hello", "language": "ur"})
+
+    assert response.status_code == 200
+    assert response.json()["language"] == "ur"
+
+
+def test_audio_parses_body_without_content_type():
+    response = client.post("/api/audio", content=b'{"text": "hello"}')
+
+    assert response.status_code == 200
+    assert response.json()["language"] == "en"
+
+
+def test_audio_rejects_non_json_content_type():
+    error = _error(client.post("/api/audio", content=b'{"text": "hello"}', headers={"content-type": "text/plain"}))
+
+    assert error["type"] == "model_attributes_type"
+    assert error["loc"] == ["body"]
+
+
+def test_audio_missing_field():
+    error = _error(client.post("/api/audio", json={}))
+
+    assert error["type"] == "missing"
+    assert error["loc"] == ["body", "text"]
+
+
+def test_audio_wrong_type():
+    error = _error(client.post("/api/audio", json={"text": 1}))
+
+    assert error["type"] == "string_type"
+    assert error["loc"] == ["body", "text"]
+
+
+def test_audio_invalid_language():
+    error = _error(client.post("/api/audio", json={"text": "hello", "language": "fr"}))
+
+    assert error["type"] == "literal_error"
+    assert error["loc"] == ["body", "language"]
+
+
+def test_audio_bad_json():
+    error = _error(client.post("/api/audio", content=b"{bad", headers={"content-type": "application/json"}))
+
+    assert error["type"] == "json_invalid"
+    assert error["loc"][0] == "body"
+
+
+def test_audio_empty_body():
+    error = _error(client.post("/api/audio"))
+
+    assert error["type"] == "missing"
+    assert error["loc"] == ["body"]
+
+
+def test_audio_request_body_in_openapi():
+    operation = client.get("/openapi.json").json()["paths"]["/api/audio"]["post"]
+    schema = operation["requestBody"]["content"]["application/json"]["schema"]
+
+    assert schema["required"] == ["text"]
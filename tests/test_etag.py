@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+
+from main import _etag_matches, app
+
+ETAG = 'W/"abc123"'
+
+
+def test_etag_matches_exact_and_weak_forms():
+    assert _etag_matches('W/"abc123"', ETAG)
+    assert _etag_matches('"abc123"', ETAG)
+
+
+def test_etag_matches_any_in_list():
+    assert _etag_matches('"other", W/"abc123"', ETAG)
+    assert not _etag_matches('"other", W/"nope"', ETAG)
+
+
+def test_etag_matches_star():
+    assert _etag_matches("*", ETAG)
+
+
+def test_etag_matches_empty_header():
+    assert not _etag_matches(None, ETAG)
+    assert not _etag_matches("", ETAG)
+
+
+def test_digest_fallback_etag_is_weak_and_stable():
+    client = TestClient(app)
+
+    first = client.get("/api/digest")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert client.get("/api/digest").headers["etag"] == etag
+
+    assert client.get("/api/digest", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/digest", headers={"If-None-Match": '"stale"'}).status_code == 200
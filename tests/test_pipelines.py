@@ -0,0 +1,35 @@
+from pipelines import build_digest_pipeline, build_feed_pipeline
+
+
+def _stage_names(pipeline):
+    return [next(iter(stage)) for stage in pipeline]
+
+
+def test_feed_pipeline_matches_first():
+    query = {"language": "en", "interests": {"$in": ["tech"]}}
+    pipeline = build_feed_pipeline(query, limit=50)
+
+    assert pipeline[0] == {"$match": query}
+    assert _stage_names(pipeline)[:3] == ["$match", "$sort", "$limit"]
+    assert pipeline[2] == {"$limit": 50}
+
+
+def test_feed_pipeline_reshapes_after_limit():
+    names = _stage_names(build_feed_pipeline({}))
+
+    limit_at = names.index("$limit")
+    assert names.index("$project") > limit_at
+    assert names.index("$addFields") > limit_at
+
+
+def test_digest_pipeline_shares_prefix_above_facet():
+    pipeline = build_digest_pipeline("ur", limit=5)
+
+    assert _stage_names(pipeline) == ["$match", "$sort", "$limit", "$facet"]
+    assert pipeline[0] == {"$match": {"language": "ur"}}
+    assert pipeline[2] == {"$limit": 5}
+    assert set(pipeline[3]["$facet"]) == {"headlines", "items"}
+
+
+def test_digest_pipeline_caps_limit_at_ten():
+    assert build_digest_pipeline("en", limit=20)[2] == {"$limit": 10}